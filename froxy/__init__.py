@@ -23,6 +23,11 @@ from .__about__ import __github__
 __version__ = __version__
 __author__ = f'{__author__} <{__email__}> and <{__github__}>'
 
-__all__ = ['Froxy']
+__all__ = ['Froxy', 'History', 'Affinity', 'WarmPool', 'Shard', 'Limiter']
 
 from ._froxy import Froxy as Froxy
+from ._history import History as History
+from ._affinity import Affinity as Affinity
+from ._pool import WarmPool as WarmPool
+from ._shard import Shard as Shard
+from ._limiter import Limiter as Limiter
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Module for per target host proxy affinity used by Froxy class."""
+
+from .__about__ import __version__
+from .__about__ import __author__
+from .__about__ import __email__
+from .__about__ import __github__
+
+__version__ = __version__
+__author__ = f'{__author__} <{__email__}> and <{__github__}>'
+
+# --- Standard libraries ----
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+
+class Affinity(object):
+    """Class for remembering which proxies work for each target host.
+
+    Both the hosts and the proxies of each host are kept in LRU maps,
+    the least recently used entries are evicted when the limits are reached.
+
+    Usage:
+    ```
+    >>> from froxy import Froxy, Affinity
+    >>> affinity = Affinity()
+    >>> froxy = Froxy(affinity=affinity)
+    >>> affinity.record('https://httpbin.org/ip', ['255.255.255.255', '3000', ...], success=True)
+    >>> froxy.get(protocol=[1, 'https'], host='httpbin.org')
+    # Output
+    [['255.255.255.255', '3000', ['US', 'N', 'S!', '+']]]
+    ```
+    """
+
+    def __init__(self, max_hosts: int=1024, max_proxies: int=256):
+        """Initialize the LRU maps.
+
+        Keyword arguments:
+
+        `max_hosts: int` - Max number of hosts remembered.
+
+        `max_proxies: int` - Max number of proxies remembered per host.
+        """
+
+        self.max_hosts = max_hosts
+        self.max_proxies = max_proxies
+
+        # Internal use
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f'The affinity contains {len(self._hosts)} hosts.'
+
+    def __repr__(self):
+        return f'Affinity(hosts=<{len(self._hosts)}>)'
+
+    @staticmethod
+    def _host(target: str) -> str:
+        """Get the normalized host of a URL or host name.
+
+        Keyword arguments:
+
+        `target: str` - URL or host name. Ex: "https://httpbin.org/ip" or "httpbin.org"
+        """
+
+        if '//' not in target:
+            target = '//' + target
+
+        return (urlsplit(target).hostname or '').lower()
+
+    def record(self, target: str, proxy: list, success: bool) -> None:
+        """Record the outcome of a request to a host made through a proxy.
+
+        Keyword arguments:
+
+        `target: str` - URL or host name requested.
+
+        `proxy: list` - Proxy used in Froxy format.
+
+        `success: bool` - If the request was successful.
+        """
+
+        host = Affinity._host(target)
+        key = (proxy[0], str(proxy[1]))
+
+        with self._lock:
+            proxies = self._hosts.get(host)
+            if proxies is None:
+                proxies = self._hosts[host] = OrderedDict()
+
+                if len(self._hosts) > self.max_hosts:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(host)
+
+            # [success, failure]
+            outcomes = proxies.get(key)
+            if outcomes is None:
+                outcomes = proxies[key] = [0, 0]
+
+                if len(proxies) > self.max_proxies:
+                    proxies.popitem(last=False)
+            else:
+                proxies.move_to_end(key)
+
+            outcomes[0 if success else 1] += 1
+
+    def forget(self, target: str) -> None:
+        """Forget everything known about a host.
+
+        Keyword arguments:
+
+        `target: str` - URL or host name.
+        """
+
+        with self._lock:
+            self._hosts.pop(Affinity._host(target), None)
+
+    def known(self, target: str) -> tuple:
+        """Get the proxies known to work and to fail for a host.
+
+        Returns a tuple `(good, bad)`, `good` is a list of keys `(ip, port)`
+        sorted by success rate and `bad` is a set of keys that only failed.
+
+        Keyword arguments:
+
+        `target: str` - URL or host name.
+        """
+
+        with self._lock:
+            host = Affinity._host(target)
+
+            known = self._hosts.get(host)
+            if not known:
+                return [], set()
+
+            # Lookups also count as use for the LRU eviction
+            self._hosts.move_to_end(host)
+
+            good = [
+                (outcomes[0] / sum(outcomes), key)
+                for key, outcomes in known.items()
+                if outcomes[0] > outcomes[1]
+            ]
+            bad = {key for key, outcomes in known.items() if not outcomes[0]}
+
+        good.sort(key=lambda item: item[0], reverse=True)
+
+        return [key for _, key in good], bad
+
+    def partition(self, target: str, proxies: list) -> tuple:
+        """Split proxies into known-good and unknown for a host.
+
+        Returns a tuple `(good, unknown)`, the good proxies are sorted by
+        success rate and the proxies that only failed for the host are dropped.
+
+        Keyword arguments:
+
+        `target: str` - URL or host name.
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        with self._lock:
+            host = Affinity._host(target)
+
+            known = self._hosts.get(host)
+            if not known:
+                return [], list(proxies)
+
+            # Lookups also count as use for the LRU eviction
+            self._hosts.move_to_end(host)
+
+            good = []
+            unknown = []
+            for proxy in proxies:
+                outcomes = known.get((proxy[0], str(proxy[1])))
+
+                if outcomes is None:
+                    unknown.append(proxy)
+
+                elif outcomes[0] > outcomes[1]:
+                    good.append((outcomes[0] / sum(outcomes), proxy))
+
+                elif outcomes[0]:
+                    unknown.append(proxy)
+
+        good.sort(key=lambda item: item[0], reverse=True)
+
+        return [proxy for _, proxy in good], unknown
@@ -27,12 +27,17 @@ __author__ = f'{__author__} <{__email__}> and <{__github__}>'
 import sys
 import re
 import random
+from contextlib import contextmanager
 
 # --- Third-party libraries ---
 import requests
 
 # --- Local libraries ---
 from ._storage import Storage
+from ._history import History
+from ._affinity import Affinity
+from ._shard import Shard
+from ._limiter import Limiter, Group
 
 from ._const import API_URL
 
@@ -68,15 +73,46 @@ class Froxy(object):
     Location of API used: https://github.com/clarketm/proxy-list
     """
     
-    def __init__(self):
+    def __init__(
+            self,
+            history: History=None,
+            affinity: Affinity=None,
+            shard: Shard=None,
+            limiter: Limiter=None
+        ):
         """Initialize storage attributes and start method to save to storage.
+
+        Keyword arguments:
+
+        `history: History` - Health history used to exclude and rank proxies (optional).
+
+        `affinity: Affinity` - Per host affinity used to prefer known-good proxies (optional).
+
+        `shard: Shard` - Keep only the proxies that belong to this node (optional).
+
+        `limiter: Limiter` - Per proxy limits used to skip saturated proxies (optional).
         
         Public Attribute:
 
         `storage: list` - Data storage and manipulation object
+
+        `history: History` - Health history of proxies or None
+
+        `affinity: Affinity` - Per host affinity of proxies or None
+
+        `shard: Shard` - Shard of this node or None
+
+        `limiter: Limiter` - Per proxy rate and concurrency limits or None
         """
 
         self.storage: list = Storage()
+        self.history: History = history
+        self.affinity: Affinity = affinity
+        self.shard: Shard = shard
+        self.limiter: Limiter = limiter
+
+        # Ready queue of all proxies for `lease()`, built on first use
+        self._group = None
 
         # Start for get data in API and set in storage
         self._set_proxies_in_storage()
@@ -156,10 +192,13 @@ class Froxy(object):
         """Save data in proxy storage."""
 
         data_raw = Froxy._get_data_in_api(API_URL)
+        data = Froxy._data_normalization(data_raw)
 
-        self.storage.insert(
-            Froxy._data_normalization(data_raw)
-        )
+        # Filters and sampling only see the slice of this node
+        if self.shard is not None:
+            data = self.shard.split(data)
+
+        self.storage.insert(data)
 
     def _base_proxies_filter(self, category: str, filters: list) -> list:
         """Filter proxies by category and flags.
@@ -193,6 +232,10 @@ class Froxy(object):
                 Froxy._filter_model(self.storage.get(), line=2, col=3, filters=filters)
             )
 
+        # Ignore proxies known to be dead
+        if self.history is not None:
+            return self.history.exclude(data_filtered)
+
         return data_filtered
 
     @staticmethod
@@ -215,8 +258,7 @@ class Froxy(object):
             data
         )
 
-    @staticmethod
-    def _filter_n_proxies(n: int, flags: list, func_filter) -> list:
+    def _filter_n_proxies(self, n: int, flags: list, func_filter, host: str=None) -> list:
         """Filter N proxies for reuse in `get(...)`.
         
         Keyword arguments:
@@ -226,19 +268,146 @@ class Froxy(object):
         `flags: list` - List of flags for filter.
         
         `func_filter: function` - Filter function used.
+
+        `host: str` - Target host to prefer known-good proxies (optional).
         """
 
         proxies = []
         for flag in flags:
             data = func_filter(flag)
-            data_length = len(data)
             
             proxies.extend(
-                random.sample(data, n if n < data_length else data_length)
+                self._sample(data, n, host)
             )
         
         return proxies
+
+    def _sample(self, data: list, n: int, host: str=None) -> list:
+        """Random sample of N proxies, weighted by the history if exists.
+
+        Proxies known to work for the host come first when there is affinity
+        and saturated proxies are skipped when there is a limiter. The proxies
+        are not acquired, use `lease(...)` for that.
+
+        Keyword arguments:
+
+        `data: list` - List of proxies.
+
+        `n: int` - Number of proxies.
+
+        `host: str` - Target host (optional).
+        """
+
+        if self.limiter is not None:
+            data = self.limiter.free(data)
+
+        proxies = []
+        if self.affinity is not None and host:
+            proxies, data = self.affinity.partition(host, data)
+            proxies = proxies[:n]
+            n -= len(proxies)
+
+        if self.history is not None:
+            proxies.extend(self.history.sample(data, n))
+
+        else:
+            data_length = len(data)
+            proxies.extend(random.sample(data, n if n < data_length else data_length))
+
+        return proxies
     
+    def _all_proxies(self, host: str=None) -> list:
+        """Get all proxies, without those excluded by the history.
+
+        Proxies known to work for the host come first when there is affinity.
+
+        Keyword arguments:
+
+        `host: str` - Target host (optional).
+        """
+
+        proxies = self.storage.get()
+
+        if self.history is not None:
+            proxies = self.history.exclude(proxies)
+
+        if self.affinity is not None and host:
+            good, unknown = self.affinity.partition(host, proxies)
+            proxies = good + unknown
+
+        return proxies
+
+    @contextmanager
+    def lease(self, proxies: list=None, host: str=None):
+        """Lease a proxy to make a request, None if there is none available.
+
+        With a limiter, the proxy is acquired on enter and released on exit,
+        so no proxy is used more than its limits allow. Proxies excluded by
+        the history or that only failed for the host are not used, and those
+        known to work for the host are tried first.
+
+        Leasing from all proxies or from a `Group` is O(1) amortized. A list
+        of proxies builds a new queue in each call, so to lease many times
+        from filtered proxies build a group once with `limiter.group(...)`.
+
+        Keyword arguments:
+
+        `proxies: list | Group` - Proxies to choose from, all proxies by default.
+
+        `host: str` - Target URL or host (optional).
+
+        Usage:
+        ```
+        >>> from froxy import Froxy, Limiter
+        >>> froxy = Froxy(limiter=Limiter(rate=0.5, max_inflight=1))
+        >>> https = froxy.limiter.group(froxy.https())  # Build once, reuse
+        >>> with froxy.lease(https, host='httpbin.org') as proxy:
+        ...     ip, port = proxy[:2]
+        ...     # Make the request
+        ```
+        """
+
+        if isinstance(proxies, Group):
+            group = proxies
+
+        elif self.limiter is None:
+            if proxies is None:
+                proxies = self.storage.get()
+
+            if self.history is not None:
+                proxies = self.history.exclude(proxies)
+
+            sample = self._sample(proxies, 1, host)
+
+            yield sample[0] if sample else None
+            return
+
+        elif proxies is not None:
+            group = self.limiter.group(proxies)
+
+        else:
+            if self._group is None:
+                self._group = self.limiter.group(self.storage.get())
+            group = self._group
+
+        prefer, bad = [], set()
+        if self.affinity is not None and host:
+            prefer, bad = self.affinity.known(host)
+
+        # Bad for this host only, so it stays in the queue for other hosts
+        def skip(proxy):
+            return (proxy[0], str(proxy[1])) in bad
+
+        # Dead for all hosts, kept out of the queue until the history cooldown ends
+        def hold(proxy):
+            if self.history is None:
+                return 0
+
+            return self.history.dead_for(proxy[0], proxy[1])
+
+        with group.lease(prefer=prefer, skip=skip, hold=hold) as proxy:
+            yield proxy
+
     @staticmethod
     def _is_valid_country(flag: str) -> bool:
         """Check if country argument is valid.
@@ -417,10 +586,15 @@ class Froxy(object):
             country: list=[],
             anonymity: list=[],
             protocol: list=[],
-            google_passed: list=[]
+            google_passed: list=[],
+            host: str=None
         ) -> list:
         """Use multiple proxy filters or get all proxies if the filter arguments are empty.
 
+        The history and the affinity are applied in both cases. With a limiter,
+        saturated proxies are skipped but the proxies are not acquired, use
+        `lease(...)` to acquire and release them.
+
         Keyword arguments:
 
         `country: list` - Number and List of flags of selected countries.
@@ -431,6 +605,8 @@ class Froxy(object):
         `protocol: list` - Number and Selected protocol (http or https).
 
         `google_passed: list` - Number and Filter flags of google passed. (- or +).
+
+        `host: str` - Target URL or host, prefer proxies known to work for it (optional).
         
         Usage:
         ```
@@ -457,7 +633,12 @@ class Froxy(object):
 
         # if don't have a filter flag, return all proxies.
         if not any([country, anonymity, protocol, google_passed]):
-            return self.storage.get()
+            proxies = self._all_proxies(host)
+
+            if self.limiter is not None:
+                proxies = self.limiter.free(proxies)
+
+            return proxies
 
         proxies = []  # Storage of filtered proxies
 
@@ -465,10 +646,11 @@ class Froxy(object):
         # --- FILTER COUNTRY ---
         if country and isinstance(country, list) and country[0] > 0:
 
-            filtred = Froxy._filter_n_proxies(
+            filtred = self._filter_n_proxies(
                         n=country[0], 
                         flags=country[1:], 
-                        func_filter=self.country
+                        func_filter=self.country,
+                        host=host
                     )
 
             proxies.extend(filtred)
@@ -477,10 +659,11 @@ class Froxy(object):
         # --- FILTER ANONYMITY ---
         if anonymity and isinstance(anonymity, list) and anonymity[0] > 0:
 
-            filtred = Froxy._filter_n_proxies(
+            filtred = self._filter_n_proxies(
                         n=anonymity[0], 
                         flags=anonymity[1:], 
-                        func_filter=self.anonymity
+                        func_filter=self.anonymity,
+                        host=host
                     )
 
             proxies.extend(filtred)
@@ -491,20 +674,22 @@ class Froxy(object):
 
             if protocol[1].lower() == 'http':
                 
-                filtred = Froxy._filter_n_proxies(
+                filtred = self._filter_n_proxies(
                         n=protocol[0], 
                         flags=['http'], 
-                        func_filter=self.http
+                        func_filter=self.http,
+                        host=host
                     )
 
                 proxies.extend(filtred)
 
             elif protocol[1].lower() == 'https':
 
-                filtred = Froxy._filter_n_proxies(
+                filtred = self._filter_n_proxies(
                         n=protocol[0], 
                         flags=['https'], 
-                        func_filter=self.https
+                        func_filter=self.https,
+                        host=host
                     )
 
                 proxies.extend(filtred)
@@ -513,10 +698,11 @@ class Froxy(object):
         # --- FILTER GOOGLE PASSED ---
         if google_passed and isinstance(google_passed, list) and google_passed[0] > 0:
 
-            filtred = Froxy._filter_n_proxies(
+            filtred = self._filter_n_proxies(
                         n=google_passed[0], 
                         flags=google_passed[1:], 
-                        func_filter=self.google
+                        func_filter=self.google,
+                        host=host
                     )
 
             proxies.extend(filtred)
@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""Module for persistent health history of proxies used by Froxy class."""
+
+from .__about__ import __version__
+from .__about__ import __author__
+from .__about__ import __email__
+from .__about__ import __github__
+
+__version__ = __version__
+__author__ = f'{__author__} <{__email__}> and <{__github__}>'
+
+# --- Standard libraries ----
+import time
+import random
+import queue
+import sqlite3
+import threading
+
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last
+# bucket holds everything slower than the highest bound.
+LATENCY_BUCKETS: tuple = tuple(0.025 * 2 ** i for i in range(11))
+
+
+class _Stats(object):
+    """Fixed size statistics of a single proxy."""
+
+    __slots__ = (
+        'success', 'failure', 'last_success', 'last_failure', 'ewma', 'buckets'
+    )
+
+    def __init__(self):
+        self.success = 0
+        self.failure = 0
+        self.last_success = None
+        self.last_failure = None
+        self.ewma = None
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def percentile(self, q: float):
+        """Approximate latency percentile from the histogram buckets."""
+
+        total = sum(self.buckets)
+        if not total:
+            return None
+
+        rank = q * total
+        count = 0
+        for idx, bucket in enumerate(self.buckets):
+            count += bucket
+            if count >= rank:
+                break
+
+        # The overflow bucket has no upper bound, use the highest known
+        return LATENCY_BUCKETS[min(idx, len(LATENCY_BUCKETS) - 1)]
+
+
+class History(object):
+    """Class for recording and persisting the health of proxies.
+
+    The outcomes are aggregated in memory with a fixed size per proxy
+    (counters, EWMA and a latency histogram) and are written to a SQLite
+    database in batches by a background thread.
+
+    Usage:
+    ```
+    >>> from froxy import Froxy, History
+    >>> history = History('froxy.db')
+    >>> froxy = Froxy(history=history)
+    >>> history.record('255.255.255.255', '3000', success=True, latency=0.35)
+    >>> history.stats('255.255.255.255', '3000')
+    # Output
+    {'success': 1, 'failure': 0, 'last_success': 1600000000.0, ...}
+    ```
+    """
+
+    def __init__(
+            self,
+            path: str=':memory:',
+            batch_size: int=500,
+            flush_interval: float=5.0,
+            alpha: float=0.2,
+            cooldown: float=3600.0
+        ):
+        """Open the database and load the previous history.
+
+        Keyword arguments:
+
+        `path: str` - SQLite database file, the default is only kept in memory.
+
+        `batch_size: int` - Number of outcomes recorded before a write to disk is queued.
+
+        `flush_interval: float` - Max seconds between writes to disk.
+
+        `alpha: float` - Smoothing factor of the latency EWMA.
+
+        `cooldown: float` - Seconds after the last failure before a dead proxy is tried again.
+        """
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.alpha = alpha
+        self.cooldown = cooldown
+
+        # Internal use
+        self._stats = {}
+        self._dirty = set()
+        self._pending = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+        # Batches of rows to write, consumed in order by the flusher thread
+        self._queue = queue.Queue()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS history (
+                ip TEXT NOT NULL,
+                port TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                failure INTEGER NOT NULL,
+                last_success REAL,
+                last_failure REAL,
+                ewma REAL,
+                buckets TEXT NOT NULL,
+                PRIMARY KEY (ip, port)
+            )
+        ''')
+        self._conn.commit()
+
+        self._load()
+
+        self._flusher = threading.Thread(target=self._run, daemon=True)
+        self._flusher.start()
+
+    def __str__(self):
+        return f'The history contains {len(self._stats)} proxies.'
+
+    def __repr__(self):
+        return f'History(length=<{len(self._stats)}>, pending=<{self._pending}>)'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _load(self) -> None:
+        """Load the history saved in the database to memory."""
+
+        for row in self._conn.execute('SELECT * FROM history'):
+            stats = _Stats()
+            (
+                stats.success,
+                stats.failure,
+                stats.last_success,
+                stats.last_failure,
+                stats.ewma
+            ) = row[2:7]
+
+            buckets = [int(b) for b in row[7].split(',')]
+            if len(buckets) == len(stats.buckets):
+                stats.buckets = buckets
+
+            self._stats[(row[0], row[1])] = stats
+
+    def record(self, ip: str, port: str, success: bool, latency: float=None) -> None:
+        """Record the outcome of a request made through a proxy.
+
+        Keyword arguments:
+
+        `ip: str` - Proxy IP address.
+
+        `port: str` - Proxy port.
+
+        `success: bool` - If the request was successful.
+
+        `latency: float` - Elapsed time of the request in seconds (optional).
+        """
+
+        key = (ip, str(port))
+        now = time.time()
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats()
+
+            if success:
+                stats.success += 1
+                stats.last_success = now
+            else:
+                stats.failure += 1
+                stats.last_failure = now
+
+            if latency is not None:
+                stats.ewma = latency if stats.ewma is None else (
+                    self.alpha * latency + (1 - self.alpha) * stats.ewma
+                )
+
+                idx = 0
+                while idx < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[idx]:
+                    idx += 1
+                stats.buckets[idx] += 1
+
+            self._dirty.add(key)
+            self._pending += 1
+
+            if self._pending >= self.batch_size:
+                self._snapshot()
+
+    def _rows(self) -> list:
+        """Get the rows of the changed proxies and clear them, the lock must be held."""
+
+        rows = []
+        for key in self._dirty:
+            s = self._stats[key]
+            rows.append((
+                key[0], key[1],
+                s.success, s.failure,
+                s.last_success, s.last_failure,
+                s.ewma,
+                ','.join(str(b) for b in s.buckets)
+            ))
+
+        self._dirty.clear()
+        self._pending = 0
+
+        return rows
+
+    def _snapshot(self) -> None:
+        """Queue the changed proxies to be written, the lock must be held."""
+
+        # After closing, the changes are kept in memory only
+        if self._closed:
+            return
+
+        rows = self._rows()
+        if rows:
+            self._queue.put(rows)
+
+    def _write(self, rows: list) -> None:
+        """Write rows to the database.
+
+        On error, e.g. "database is locked", the proxies are marked as
+        changed again, so the next snapshot writes them with their latest
+        values and the queue never holds more than one batch per write.
+        """
+
+        try:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self._conn.commit()
+
+        except sqlite3.Error:
+            try:
+                self._conn.rollback()
+            except sqlite3.Error:
+                pass
+
+            with self._lock:
+                self._dirty.update((row[0], row[1]) for row in rows)
+
+    def _run(self) -> None:
+        """Flusher thread, writes the queued batches to the database.
+
+        When nothing is queued for `flush_interval` seconds, the pending
+        outcomes are queued, so they are written even if `record(...)`
+        stops being called.
+        """
+
+        while True:
+            try:
+                rows = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    self._snapshot()
+                continue
+
+            try:
+                if rows is None:
+                    return
+
+                self._write(rows)
+
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Write the pending outcomes to the database and wait for it.
+
+        Outcomes that could not be written are kept and written later.
+        """
+
+        with self._lock:
+            self._snapshot()
+
+        if self._flusher.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write the pending outcomes and close the database."""
+
+        with self._lock:
+            if self._closed:
+                return
+
+            self._snapshot()
+            self._closed = True
+
+        if self._flusher.is_alive():
+            self._queue.put(None)
+            self._flusher.join()
+
+        # Write what the flusher could not, newest rows last
+        rows = []
+        while not self._queue.empty():
+            rows.extend(self._queue.get_nowait() or [])
+
+        with self._lock:
+            rows.extend(self._rows())
+
+        try:
+            if rows:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                self._conn.commit()
+
+        finally:
+            self._conn.close()
+
+    def stats(self, ip: str, port: str) -> dict:
+        """Get the statistics of a proxy or an empty dict if it has no history.
+
+        Keyword arguments:
+
+        `ip: str` - Proxy IP address.
+
+        `port: str` - Proxy port.
+        """
+
+        with self._lock:
+            stats = self._stats.get((ip, str(port)))
+            if stats is None:
+                return {}
+
+            return {
+                'success': stats.success,
+                'failure': stats.failure,
+                'last_success': stats.last_success,
+                'last_failure': stats.last_failure,
+                'ewma': stats.ewma,
+                'p50': stats.percentile(0.5),
+                'p90': stats.percentile(0.9),
+                'p99': stats.percentile(0.99)
+            }
+
+    def score(self, ip: str, port: str) -> float:
+        """Get the smoothed success rate of a proxy, 0.5 if it has no history.
+
+        Keyword arguments:
+
+        `ip: str` - Proxy IP address.
+
+        `port: str` - Proxy port.
+        """
+
+        stats = self._stats.get((ip, str(port)))
+        if stats is None:
+            return 0.5
+
+        # Laplace smoothing, so few outcomes don't decide alone
+        return (stats.success + 1) / (stats.success + stats.failure + 2)
+
+    def rank(self, proxies: list) -> list:
+        """Sort proxies from the healthiest to the least healthy.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        return sorted(
+            proxies,
+            key=lambda proxy: self.score(proxy[0], proxy[1]),
+            reverse=True
+        )
+
+    def dead_for(self, ip: str, port: str, min_score: float=0.25, min_outcomes: int=3) -> float:
+        """Get the seconds until a proxy is tried again, 0 if it is not dead.
+
+        A proxy is dead when its score is below `min_score` and it failed in
+        the last `cooldown` seconds without succeeding after that, so a proxy
+        that was dead yesterday is tried again.
+
+        Keyword arguments:
+
+        `ip: str` - Proxy IP address.
+
+        `port: str` - Proxy port.
+
+        `min_score: float` - Minimum score to keep the proxy.
+
+        `min_outcomes: int` - Minimum outcomes recorded before excluding a proxy.
+        """
+
+        stats = self._stats.get((ip, str(port)))
+        if stats is None or stats.success + stats.failure < min_outcomes:
+            return 0.0
+
+        if stats.last_failure is None:
+            return 0.0
+
+        if stats.last_success is not None and stats.last_success > stats.last_failure:
+            return 0.0
+
+        if self.score(ip, port) >= min_score:
+            return 0.0
+
+        return max(0.0, stats.last_failure + self.cooldown - time.time())
+
+    def is_dead(self, ip: str, port: str, min_score: float=0.25, min_outcomes: int=3) -> bool:
+        """Check if a proxy has a bad recent history, see `dead_for(...)`.
+
+        Keyword arguments:
+
+        `ip: str` - Proxy IP address.
+
+        `port: str` - Proxy port.
+
+        `min_score: float` - Minimum score to keep the proxy.
+
+        `min_outcomes: int` - Minimum outcomes recorded before excluding a proxy.
+        """
+
+        return self.dead_for(ip, port, min_score, min_outcomes) > 0
+
+    def exclude(self, proxies: list, min_score: float=0.25, min_outcomes: int=3) -> list:
+        """Remove proxies with a bad recent history, see `is_dead(...)`.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+
+        `min_score: float` - Minimum score to keep the proxy.
+
+        `min_outcomes: int` - Minimum outcomes recorded before excluding a proxy.
+        """
+
+        return [
+            proxy for proxy in proxies
+            if not self.is_dead(proxy[0], proxy[1], min_score, min_outcomes)
+        ]
+
+    def sample(self, proxies: list, n: int) -> list:
+        """Random sample of N proxies weighted by their score.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+
+        `n: int` - Number of proxies.
+        """
+
+        # Weighted sampling without replacement (Efraimidis-Spirakis)
+        keys = [
+            (random.random() ** (1 / self.score(proxy[0], proxy[1])), idx)
+            for idx, proxy in enumerate(proxies)
+        ]
+        keys.sort(reverse=True)
+
+        return [proxies[idx] for _, idx in keys[:n]]
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""Module for per proxy rate limiting and concurrency caps of Froxy class."""
+
+from .__about__ import __version__
+from .__about__ import __author__
+from .__about__ import __email__
+from .__about__ import __github__
+
+__version__ = __version__
+__author__ = f'{__author__} <{__email__}> and <{__github__}>'
+
+# --- Standard libraries ----
+import time
+import heapq
+import threading
+from weakref import WeakSet
+from collections import deque
+from contextlib import contextmanager
+
+
+class Group(object):
+    """Ready queue of a list of proxies sharing the limits of a Limiter.
+
+    The proxies are served round robin. A saturated proxy is parked when
+    it reaches the front of the queue and only comes back when it is free
+    again, and a proxy held by `hold` is kept out of the queue until its
+    time ends, so picking a proxy is O(1) amortized.
+
+    Created by `Limiter.group(...)`, build it once and reuse it.
+    """
+
+    def __init__(self, limiter, proxies: list):
+        """Initialize the ready queue.
+
+        Keyword arguments:
+
+        `limiter: Limiter` - Limiter whose limits are applied.
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        self.limiter = limiter
+
+        # Internal use
+        self._proxies = {}
+        for proxy in proxies:
+            self._proxies.setdefault((proxy[0], str(proxy[1])), proxy)
+
+        self._ready = deque(self._proxies)
+        self._held = []  # Heap of (release_at, key) of proxies kept out of the queue
+
+    def __len__(self):
+        return len(self._proxies)
+
+    def __repr__(self):
+        return f'Group(length=<{len(self._proxies)}>, ready=<{len(self._ready)}>)'
+
+    def acquire(self, prefer: list=(), skip=None, hold=None) -> list:
+        """Acquire a proxy that is not saturated, None if all are.
+
+        It must be released with `Limiter.release(...)`.
+
+        Keyword arguments:
+
+        `prefer: list` - Keys `(ip, port)` tried first, in order (optional).
+
+        `skip: function` - Receives a proxy and returns True to not use it in
+            this call only, it stays in the queue (optional).
+
+        `hold: function` - Receives a proxy and returns the seconds to keep it
+            out of the queue, 0 to use it. For proxies unusable in all calls,
+            e.g. dead in the history (optional).
+        """
+
+        limiter = self.limiter
+
+        with limiter._lock:
+            now = time.monotonic()
+            limiter._wake(now)
+
+            while self._held and self._held[0][0] <= now:
+                _, key = heapq.heappop(self._held)
+                self._ready.append(key)
+
+            # Preferred proxies stay in the queue, so they are only skipped here
+            for key in prefer:
+                proxy = self._proxies.get(key)
+                if proxy is None or key in limiter._busy:
+                    continue
+
+                if hold is not None and hold(proxy) > 0:
+                    continue
+
+                if skip is not None and skip(proxy):
+                    continue
+
+                if limiter._take(key, now):
+                    return proxy
+
+            for _ in range(len(self._ready)):
+                key = self._ready.popleft()
+
+                if key in limiter._busy:
+                    limiter._park(key, self)
+                    continue
+
+                proxy = self._proxies[key]
+
+                delay = hold(proxy) if hold is not None else 0
+                if delay > 0:
+                    heapq.heappush(self._held, (now + delay, key))
+                    continue
+
+                if skip is not None and skip(proxy):
+                    self._ready.append(key)
+                    continue
+
+                limiter._take(key, now)
+
+                if key in limiter._busy:
+                    limiter._park(key, self)
+                else:
+                    self._ready.append(key)
+
+                return proxy
+
+        return None
+
+    @contextmanager
+    def lease(self, prefer: list=(), skip=None, hold=None):
+        """Lease a proxy that is not saturated, None if all are.
+
+        The lease is released on exit, see `acquire(...)` for the arguments.
+        """
+
+        proxy = self.acquire(prefer, skip, hold)
+
+        try:
+            yield proxy
+
+        finally:
+            if proxy is not None:
+                self.limiter.release(proxy)
+
+
+class Limiter(object):
+    """Class for limiting the request rate and in-flight leases of each proxy.
+
+    Each proxy has a token bucket of `burst` tokens refilled at `rate` tokens
+    per second and a cap of `max_inflight` simultaneous leases. Saturated
+    proxies are kept in a set and the token limited ones in a heap ordered
+    by refill time, so they are skipped without being checked again.
+
+    Usage:
+    ```
+    >>> from froxy import Froxy, Limiter
+    >>> limiter = Limiter(rate=0.5, burst=2, max_inflight=1)
+    >>> froxy = Froxy(limiter=limiter)
+    >>> https = limiter.group(froxy.https())  # Build once, reuse
+    >>> with froxy.lease(https) as proxy:
+    ...     if proxy is not None:
+    ...         ip, port = proxy[:2]
+    ...         # Make the request
+    ```
+    """
+
+    def __init__(
+            self,
+            rate: float=1.0,
+            burst: int=1,
+            max_inflight: int=1,
+            idle: float=60.0
+        ):
+        """Initialize the limits applied to each proxy.
+
+        Keyword arguments:
+
+        `rate: float` - Requests per second allowed per proxy, None for no limit.
+
+        `burst: int` - Max requests allowed at once after an idle period.
+
+        `max_inflight: int` - Max simultaneous leases per proxy, None for no limit.
+
+        `idle: float` - Seconds between removals of idle and refilled proxies from memory.
+        """
+
+        self.rate = rate
+        self.burst = burst
+        self.max_inflight = max_inflight
+        self.idle = idle
+
+        # Internal use, (ip, port) -> [tokens, last_refill, inflight]
+        self._buckets = {}
+        self._busy = set()
+        self._waiting = []  # Heap of (ready_at, key) of token saturated proxies
+        self._parked = {}   # key -> groups waiting for the key to be free
+        self._next_sweep = time.monotonic() + idle
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f'The limiter contains {len(self._buckets)} proxies.'
+
+    def __repr__(self):
+        return (
+            f'Limiter(rate=<{self.rate}>, burst=<{self.burst}>, '
+            f'max_inflight=<{self.max_inflight}>)'
+        )
+
+    def _refill(self, bucket: list, now: float) -> None:
+        """Add the tokens earned since the last refill."""
+
+        if self.rate is not None:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+
+    def _is_free(self, bucket: list) -> bool:
+        """Check if the bucket has a token and a free lease slot."""
+
+        return (
+            (self.rate is None or bucket[0] >= 1)
+            and (self.max_inflight is None or bucket[2] < self.max_inflight)
+        )
+
+    def _take(self, key: tuple, now: float) -> bool:
+        """Take a token and a lease slot if the key is free, the lock must be held."""
+
+        if key in self._busy:
+            return False
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now, 0]
+        else:
+            self._refill(bucket, now)
+
+        # A key out of `_busy` is always free
+        if self.rate is not None:
+            bucket[0] -= 1
+        bucket[2] += 1
+
+        if not self._is_free(bucket):
+            self._busy.add(key)
+
+            if self.rate is not None and bucket[0] < 1:
+                heapq.heappush(self._waiting, (now + (1 - bucket[0]) / self.rate, key))
+
+        return True
+
+    def _park(self, key: tuple, group: Group) -> None:
+        """Put the group back in the key queue when it is free, the lock must be held."""
+
+        groups = self._parked.get(key)
+        if groups is None:
+            groups = self._parked[key] = WeakSet()
+
+        groups.add(group)
+
+    def _free(self, key: tuple) -> None:
+        """Mark the key as free and return it to the parked groups."""
+
+        self._busy.discard(key)
+
+        for group in self._parked.pop(key, ()):
+            group._ready.append(key)
+
+    def _wake(self, now: float) -> None:
+        """Free the keys whose tokens were refilled, the lock must be held."""
+
+        while self._waiting and self._waiting[0][0] <= now:
+            _, key = heapq.heappop(self._waiting)
+
+            bucket = self._buckets.get(key)
+            if bucket is None or key not in self._busy:
+                continue
+
+            self._refill(bucket, now)
+
+            if self._is_free(bucket):
+                self._free(key)
+
+            # Still without tokens, when only the leases are full the release frees it
+            elif bucket[0] < 1:
+                heapq.heappush(self._waiting, (now + (1 - bucket[0]) / self.rate, key))
+
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+    def _sweep(self, now: float) -> None:
+        """Remove the idle and refilled keys, they are the same as new ones."""
+
+        for key, bucket in list(self._buckets.items()):
+            if key in self._busy or bucket[2]:
+                continue
+
+            self._refill(bucket, now)
+
+            if self.rate is None or bucket[0] >= self.burst:
+                del self._buckets[key]
+
+        self._next_sweep = now + self.idle
+
+    def available(self, proxy: list) -> bool:
+        """Check if the proxy can be used now, without acquiring it.
+
+        Keyword arguments:
+
+        `proxy: list` - Proxy in Froxy format.
+        """
+
+        with self._lock:
+            self._wake(time.monotonic())
+
+            return (proxy[0], str(proxy[1])) not in self._busy
+
+    def free(self, proxies: list) -> list:
+        """Get only the proxies that are not saturated, without acquiring them.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        with self._lock:
+            self._wake(time.monotonic())
+            busy = set(self._busy)
+
+        return [proxy for proxy in proxies if (proxy[0], str(proxy[1])) not in busy]
+
+    def acquire(self, proxy: list) -> bool:
+        """Take a token and a lease slot of the proxy if it is not saturated.
+
+        Returns True if acquired, it must be released with `release(...)`.
+
+        Keyword arguments:
+
+        `proxy: list` - Proxy in Froxy format.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._wake(now)
+
+            return self._take((proxy[0], str(proxy[1])), now)
+
+    def release(self, proxy: list) -> None:
+        """Release a lease slot of the proxy.
+
+        Keyword arguments:
+
+        `proxy: list` - Proxy in Froxy format.
+        """
+
+        key = (proxy[0], str(proxy[1]))
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or bucket[2] <= 0:
+                return
+
+            bucket[2] -= 1
+
+            if key in self._busy:
+                self._refill(bucket, time.monotonic())
+
+                if self._is_free(bucket):
+                    self._free(key)
+
+    def group(self, proxies: list) -> Group:
+        """Create a ready queue of proxies for O(1) amortized leases.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        return Group(self, proxies)
+
+    def lease(self, proxies: list):
+        """Lease a proxy of the list that is not saturated, None if all are.
+
+        Context manager, the lease is released on exit. Building the queue
+        is O(N), to lease many times from the same proxies use `group(...)`.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        return self.group(proxies).lease()
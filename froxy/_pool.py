@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""Module for a warm pool of pre-validated proxies of Froxy class."""
+
+from .__about__ import __version__
+from .__about__ import __author__
+from .__about__ import __email__
+from .__about__ import __github__
+
+__version__ = __version__
+__author__ = f'{__author__} <{__email__}> and <{__github__}>'
+
+# --- Standard libraries ----
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Third-party libraries ---
+import requests
+
+# --- Local libraries ---
+from ._const import HTTP_FLAGS, HTTPS_FLAGS
+
+
+# Default URLs requested through the proxies, by protocol of the profile
+CHECK_URLS: dict = {
+    'http': 'http://httpbin.org/ip',
+    'https': 'https://httpbin.org/ip'
+}
+
+
+class _Profile(object):
+    """Filter flags and verified proxies of a pool profile."""
+
+    def __init__(
+            self,
+            size: int,
+            country: list,
+            anonymity: list,
+            protocol: str,
+            google_passed: str,
+            check_url: str
+        ):
+        self.size = size
+        self.check_url = check_url
+
+        self.country = [c.upper() for c in country] if country else None
+        self.anonymity = [a.upper() for a in anonymity] if anonymity else None
+        self.protocol = None
+        if protocol:
+            self.protocol = HTTPS_FLAGS if protocol.lower() == 'https' else HTTP_FLAGS
+        self.google_passed = google_passed
+
+        # (verified_at, proxy), the most recent on the right
+        self.ready = deque()
+
+        # Proxies in `ready` or being validated, to avoid duplicates
+        self.keys = set()
+        self.validating = 0
+
+    def match(self, proxy: list) -> bool:
+        """Check if the proxy flags match the profile."""
+
+        country, anonymity, type_, google_passed = proxy[2]
+
+        return (
+            (self.country is None or country in self.country)
+            and (self.anonymity is None or anonymity in self.anonymity)
+            and (self.protocol is None or type_ in self.protocol)
+            and (self.google_passed is None or google_passed == self.google_passed)
+        )
+
+
+class WarmPool(object):
+    """Class for keeping proxies validated in the background, ready for use.
+
+    A background thread validates candidates from the Froxy storage with
+    bounded concurrency and keeps up to `size` recently verified proxies
+    for each registered profile. `checkout(...)` is O(1).
+
+    Usage:
+    ```
+    >>> from froxy import Froxy, WarmPool
+    >>> froxy = Froxy()
+    >>> pool = WarmPool(froxy, size=5, max_age=120)
+    >>> pool.register('secure', protocol='https', anonymity=['H'])
+    >>> pool.start()
+    >>> pool.checkout('secure')
+    # Output
+    ['255.255.255.255', '3000', ['US', 'H', 'S!', '+']]
+    >>> pool.stop()
+    ```
+    """
+
+    def __init__(
+            self,
+            froxy,
+            size: int=10,
+            max_age: float=60.0,
+            workers: int=8,
+            interval: float=1.0,
+            check_url: str=None,
+            timeout: float=5.0,
+            retry_after: float=300.0,
+            check=None
+        ):
+        """Initialize the pool, the background thread is started by `start()`.
+
+        Keyword arguments:
+
+        `froxy: Froxy` - Froxy instance, source of candidates.
+
+        `size: int` - Default number of verified proxies kept per profile.
+
+        `max_age: float` - Seconds after which a verified proxy expires.
+
+        `workers: int` - Max number of concurrent validations.
+
+        `interval: float` - Seconds between refill rounds.
+
+        `check_url: str` - URL requested through the proxy to validate it, by default
+            an https URL for https profiles and an http URL for the others.
+
+        `timeout: float` - Timeout in seconds of the validation request.
+
+        `retry_after: float` - Seconds before a proxy that failed validation is tried again.
+
+        `check: function` - Custom validation, receives the proxy and returns a bool (optional).
+        """
+
+        self.froxy = froxy
+        self.size = size
+        self.max_age = max_age
+        self.workers = workers
+        self.interval = interval
+        self.check_url = check_url
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.check = check
+
+        # Internal use
+        self._profiles = {}
+        # (ip, port) -> time when it can be validated again, bounded by the storage size
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def __str__(self):
+        return f'The warm pool contains {len(self._profiles)} profiles.'
+
+    def __repr__(self):
+        return f'WarmPool(profiles=<{list(self._profiles)}>, size=<{self.size}>)'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def register(
+            self,
+            name: str,
+            country: list=None,
+            anonymity: list=None,
+            protocol: str=None,
+            google_passed: str=None,
+            size: int=None,
+            check_url: str=None
+        ) -> None:
+        """Register a filter profile to keep verified proxies.
+
+        Keyword arguments:
+
+        `name: str` - Profile name used in `checkout(...)`.
+
+        `country: list` - Flags of selected countries (optional).
+
+        `anonymity: list` - Flags of selected anonymity levels (optional).
+
+        `protocol: str` - Selected protocol, http or https (optional).
+
+        `google_passed: str` - Flag of google passed, - or + (optional).
+
+        `size: int` - Number of verified proxies kept, the pool size by default.
+
+        `check_url: str` - URL to validate the proxies of this profile (optional).
+        """
+
+        if check_url is None:
+            check_url = self.check_url
+
+        if check_url is None:
+            is_https = bool(protocol) and protocol.lower() == 'https'
+            check_url = CHECK_URLS['https' if is_https else 'http']
+
+        with self._lock:
+            self._profiles[name] = _Profile(
+                size=size or self.size,
+                country=country,
+                anonymity=anonymity,
+                protocol=protocol,
+                google_passed=google_passed,
+                check_url=check_url
+            )
+
+    def start(self) -> None:
+        """Start validating proxies in the background."""
+
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background validation and wait for running checks to finish."""
+
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+        self._thread = None
+        self._executor = None
+
+    def _run(self) -> None:
+        """Background loop of refill rounds."""
+
+        while not self._stop.is_set():
+            self.refill()
+            self._stop.wait(self.interval)
+
+    def refill(self) -> None:
+        """Remove expired proxies and submit candidates to fill the profiles.
+
+        The candidates are chosen without holding the lock, so `checkout(...)`
+        never waits for the storage copy or the filtering.
+        """
+
+        if self._executor is None:
+            return
+
+        now = time.monotonic()
+        deadline = now - self.max_age
+
+        with self._lock:
+            needs = []
+            for profile in self._profiles.values():
+                while profile.ready and profile.ready[0][0] < deadline:
+                    _, proxy = profile.ready.popleft()
+                    profile.keys.discard((proxy[0], proxy[1]))
+
+                needed = profile.size - len(profile.ready) - profile.validating
+                if needed > 0:
+                    needs.append((profile, needed))
+
+        if not needs:
+            return
+
+        # The sets are only read here, the choices are checked again below
+        storage = self.froxy.storage.get()
+
+        chosen = []
+        for profile, needed in needs:
+            candidates = [
+                proxy for proxy in storage
+                if profile.match(proxy)
+                and (proxy[0], proxy[1]) not in profile.keys
+                and self._failed.get((proxy[0], proxy[1]), 0) <= now
+            ]
+
+            chosen.append((profile, self._pick(candidates, needed)))
+
+        with self._lock:
+            for profile, proxies in chosen:
+                for proxy in proxies:
+                    key = (proxy[0], proxy[1])
+
+                    if key in profile.keys:
+                        continue
+
+                    if profile.size - len(profile.ready) - profile.validating <= 0:
+                        break
+
+                    profile.keys.add(key)
+                    profile.validating += 1
+
+                    self._executor.submit(self._validate, profile, proxy)
+
+    def _pick(self, candidates: list, n: int) -> list:
+        """Choose N candidates, weighted by the Froxy history if exists."""
+
+        history = self.froxy.history
+
+        if history is not None:
+            return history.sample(history.exclude(candidates), n)
+
+        return random.sample(candidates, min(n, len(candidates)))
+
+    def _validate(self, profile: _Profile, proxy: list) -> None:
+        """Validate a candidate and add it to the profile if it works."""
+
+        # Skip the validations still queued when the pool is stopped
+        if self._stop.is_set():
+            with self._lock:
+                profile.validating -= 1
+                profile.keys.discard((proxy[0], proxy[1]))
+            return
+
+        start = time.monotonic()
+        try:
+            if self.check is not None:
+                ok = bool(self.check(proxy))
+            else:
+                ok = self._check(proxy, profile.check_url)
+        except Exception:
+            ok = False
+        now = time.monotonic()
+
+        if self.froxy.history is not None:
+            self.froxy.history.record(proxy[0], proxy[1], success=ok, latency=now - start)
+
+        with self._lock:
+            profile.validating -= 1
+
+            if ok:
+                profile.ready.append((now, proxy))
+                self._failed.pop((proxy[0], proxy[1]), None)
+            else:
+                profile.keys.discard((proxy[0], proxy[1]))
+                self._failed[(proxy[0], proxy[1])] = now + self.retry_after
+
+    def _check(self, proxy: list, url: str) -> bool:
+        """Default validation, request the URL through the proxy."""
+
+        address = f'http://{proxy[0]}:{proxy[1]}'
+
+        resp = requests.request(
+            'GET',
+            url,
+            proxies={'http': address, 'https': address},
+            timeout=self.timeout
+        )
+
+        return resp.ok
+
+    def checkout(self, name: str) -> list:
+        """Get the most recently verified proxy of a profile or None if empty.
+
+        The proxy is removed from the pool and will be validated again
+        before being served another time.
+
+        Keyword arguments:
+
+        `name: str` - Profile name.
+        """
+
+        with self._lock:
+            profile = self._profiles[name]
+
+            # The most recent is on the right, so when it is expired all are
+            if profile.ready and profile.ready[-1][0] >= time.monotonic() - self.max_age:
+                _, proxy = profile.ready.pop()
+                profile.keys.discard((proxy[0], proxy[1]))
+
+                return proxy
+
+            return None
+
+    def available(self, name: str) -> int:
+        """Number of verified proxies ready in a profile, expired included.
+
+        Keyword arguments:
+
+        `name: str` - Profile name.
+        """
+
+        with self._lock:
+            return len(self._profiles[name].ready)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Module for sharding the proxies of Froxy class across nodes."""
+
+from .__about__ import __version__
+from .__about__ import __author__
+from .__about__ import __email__
+from .__about__ import __github__
+
+__version__ = __version__
+__author__ = f'{__author__} <{__email__}> and <{__github__}>'
+
+# --- Standard libraries ----
+from hashlib import blake2b
+
+
+class Shard(object):
+    """Class for assigning each proxy to one of N nodes.
+
+    Uses rendezvous (highest random weight) hashing: each proxy belongs to
+    the node with the highest hash of `(node, ip, port)`. No coordination is
+    needed, every node computes the same assignment, and when a node joins
+    or leaves only the proxies of that node move.
+
+    Usage:
+    ```
+    >>> from froxy import Froxy, Shard
+    >>> shard = Shard('node-1', ['node-1', 'node-2', 'node-3'])
+    >>> froxy = Froxy(shard=shard)  # Storage only keeps the proxies of node-1
+    >>> shard.owner(['255.255.255.255', '3000', ['US', 'N', 'S!', '+']])
+    # Output
+    'node-2'
+    ```
+    """
+
+    def __init__(self, node: str, nodes: list):
+        """Initialize the shard of a node.
+
+        Keyword arguments:
+
+        `node: str` - Name of this node, must be in `nodes`.
+
+        `nodes: list` - Names of all nodes.
+        """
+
+        nodes = [str(n) for n in nodes]
+        if str(node) not in nodes:
+            raise ValueError(f'The node {node!r} is not in nodes.')
+
+        self.node = str(node)
+        self.nodes = sorted(set(nodes))
+
+    def __str__(self):
+        return f'The shard {self.node} is one of {len(self.nodes)} nodes.'
+
+    def __repr__(self):
+        return f'Shard(node=<{self.node}>, nodes=<{len(self.nodes)}>)'
+
+    @staticmethod
+    def _weight(node: str, ip: str, port: str) -> int:
+        """Stable hash of a node and proxy, the same in all processes."""
+
+        return int.from_bytes(
+            blake2b(f'{node}|{ip}:{port}'.encode(), digest_size=8).digest(),
+            'big'
+        )
+
+    def owner(self, proxy: list) -> str:
+        """Get the node that owns the proxy.
+
+        Keyword arguments:
+
+        `proxy: list` - Proxy in Froxy format.
+        """
+
+        ip, port = proxy[0], str(proxy[1])
+
+        return max(self.nodes, key=lambda node: Shard._weight(node, ip, port))
+
+    def owns(self, proxy: list) -> bool:
+        """Check if the proxy belongs to this node.
+
+        Keyword arguments:
+
+        `proxy: list` - Proxy in Froxy format.
+        """
+
+        return self.owner(proxy) == self.node
+
+    def split(self, proxies: list) -> list:
+        """Get only the proxies that belong to this node.
+
+        Keyword arguments:
+
+        `proxies: list` - List of proxies in Froxy format.
+        """
+
+        return [proxy for proxy in proxies if self.owns(proxy)]